@@ -2,25 +2,40 @@
 SpatialLM3D Backend API
 FastAPI server que procesa point clouds usando HuggingFace Inference API
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Optional
-import tempfile
-import shutil
+from typing import Callable, Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
 import os
-import json
+import functools
+import hashlib
 from pathlib import Path
 import logging
+import msgpack
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MOCK_DATA_DIR = Path(__file__).parent / "mock_data"
+
+# Los resultados se recargan al cambiar el archivo: revalidar siempre (ETag -> 304)
+PRECOMPUTED_CACHE_CONTROL = "public, no-cache"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    _warm_precomputed_cache()
+    yield
+
 app = FastAPI(
     title="SpatialLM3D API",
     description="Backend API para analisis de escenas 3D con SpatialLM",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS para permitir requests desde app KMP
@@ -32,6 +47,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Comprimir respuestas JSON (claves repetidas comprimen muy bien)
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
 # Modelos de datos (basados en paper SpatialLM + compatible con Kotlin models)
 class Point3D(BaseModel):
     x: float
@@ -86,6 +104,110 @@ class AnalysisResponse(BaseModel):
     model_version: str
     point_count: int
 
+# Escenas mock constantes, construidas una sola vez al importar el modulo
+MOCK_SCENE_ANALYZE = SceneStructure(
+    walls=[
+        Wall(
+            id="wall_0",
+            startPoint=Point3D(x=0.0, y=0.0, z=0.0),
+            endPoint=Point3D(x=5.0, y=0.0, z=0.0),
+            height=2.5
+        ),
+        Wall(
+            id="wall_1",
+            startPoint=Point3D(x=5.0, y=0.0, z=0.0),
+            endPoint=Point3D(x=5.0, y=4.0, z=0.0),
+            height=2.5
+        ),
+        Wall(
+            id="wall_2",
+            startPoint=Point3D(x=5.0, y=4.0, z=0.0),
+            endPoint=Point3D(x=0.0, y=4.0, z=0.0),
+            height=2.5
+        ),
+        Wall(
+            id="wall_3",
+            startPoint=Point3D(x=0.0, y=4.0, z=0.0),
+            endPoint=Point3D(x=0.0, y=0.0, z=0.0),
+            height=2.5
+        )
+    ],
+    doors=[
+        Door(
+            id="door_0",
+            wallId="wall_0",
+            position=Point3D(x=2.5, y=0.0, z=0.0),
+            width=0.9,
+            height=2.1
+        )
+    ],
+    windows=[
+        Window(
+            id="window_0",
+            wallId="wall_1",
+            position=Point3D(x=5.0, y=2.0, z=1.0),
+            width=1.2,
+            height=1.5
+        )
+    ],
+    objects=[
+        BoundingBox(
+            id="bbox_0",
+            objectClass="sofa",
+            position=Point3D(x=1.5, y=2.0, z=0.5),
+            rotation=0.0,
+            scale=Point3D(x=2.0, y=0.9, z=0.8),
+            confidence=0.95
+        ),
+        BoundingBox(
+            id="bbox_1",
+            objectClass="coffee_table",
+            position=Point3D(x=2.5, y=2.5, z=0.4),
+            rotation=0.0,
+            scale=Point3D(x=1.2, y=0.6, z=0.45),
+            confidence=0.89
+        )
+    ]
+)
+
+# Fallback para archivos sin resultados pre-computados
+MOCK_SCENE_FALLBACK = SceneStructure(
+    walls=[
+        Wall(
+            id="wall_0",
+            startPoint=Point3D(x=0.0, y=0.0, z=0.0),
+            endPoint=Point3D(x=5.0, y=0.0, z=0.0),
+            height=2.5
+        )
+    ],
+    doors=[],
+    windows=[],
+    objects=[
+        BoundingBox(
+            id="bbox_0",
+            objectClass="unknown",
+            position=Point3D(x=2.5, y=2.0, z=0.5),
+            rotation=0.0,
+            scale=Point3D(x=1.0, y=1.0, z=1.0),
+            confidence=0.5
+        )
+    ]
+)
+
+MOCK_ANALYZE_BYTES = AnalysisResponse(
+    scene=MOCK_SCENE_ANALYZE,
+    inference_time=2.5,
+    model_version="SpatialLM1.1-Qwen-0.5B (mock)",
+    point_count=50000
+).model_dump_json().encode()
+
+MOCK_FALLBACK_BYTES = AnalysisResponse(
+    scene=MOCK_SCENE_FALLBACK,
+    inference_time=0.05,
+    model_version="SpatialLM1.1-Qwen-0.5B (pre-computed)",
+    point_count=50000
+).model_dump_json().encode()
+
 # Health check
 @app.get("/")
 async def root():
@@ -98,7 +220,8 @@ async def root():
             "health": "/health",
             "analyze": "/api/v1/analyze (POST)",
             "analyze_file": "/api/v1/analyze/file (POST)",
-            "precomputed": "/api/v1/precomputed/{scene_id} (GET)"
+            "precomputed": "/api/v1/precomputed/{scene_id} (GET)",
+            "precomputed_msgpack": "/api/v2/precomputed/{scene_id} (GET)"
         }
     }
 
@@ -107,16 +230,74 @@ async def health_check():
     """Health check endpoint para monitoring"""
     return {"status": "healthy"}
 
-def list_available_scenes() -> List[str]:
+def _scene_index() -> Dict[str, Path]:
+    """Current scene registry, re-scanned only when the mock_data directory changes."""
+    try:
+        dir_mtime_ns = MOCK_DATA_DIR.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    return _index_scenes(dir_mtime_ns)
+
+@functools.lru_cache(maxsize=1)
+def _index_scenes(dir_mtime_ns: int) -> Dict[str, Path]:
+    """Map every pre-computed scene ID in mock_data to its JSON file."""
+    json_files = sorted(MOCK_DATA_DIR.glob("*_results.json"))
+    return {f.stem.replace("_results", ""): f for f in json_files}
+
+def _scene_mtime_ns(scene_id: str) -> Optional[int]:
+    """Modification time of a scene's JSON file, None if the scene is unknown."""
+    json_path = _scene_index().get(scene_id)
+    if json_path is None:
+        return None
+    try:
+        return json_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def list_available_scenes() -> Tuple[str, ...]:
     """List all available pre-computed scenes."""
-    mock_data_dir = Path(__file__).parent / "mock_data"
-    if not mock_data_dir.exists():
-        return []
-    json_files = mock_data_dir.glob("*_results.json")
-    return [f.stem.replace("_results", "") for f in json_files]
-
-@app.get("/api/v1/precomputed/{scene_id}")
-async def get_precomputed_result(scene_id: str):
+    return tuple(_scene_index())
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def _serve_precomputed(
+    scene_id: str,
+    request: Request,
+    render: Callable[[str, int], Optional[Tuple[bytes, str]]],
+    media_type: str
+) -> Response:
+    """Return a cached pre-computed blob with ETag/Cache-Control headers (or 304/404)."""
+    mtime_ns = _scene_mtime_ns(scene_id)
+    precomputed = render(scene_id, mtime_ns) if mtime_ns is not None else None
+
+    if precomputed is None:
+        logger.warning(f"No pre-computed results found for: {scene_id}")
+        available_scenes = list_available_scenes()
+        raise HTTPException(
+            status_code=404,
+            detail=f"No pre-computed results available for scene: {scene_id}. "
+                   f"Available scenes: {list(available_scenes)}"
+        )
+
+    blob, etag = precomputed
+    headers = {
+        "ETag": etag,
+        "Cache-Control": PRECOMPUTED_CACHE_CONTROL,
+        "Vary": "Accept-Encoding"
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=blob, media_type=media_type, headers=headers)
+
+@app.get("/api/v1/precomputed/{scene_id}", response_model=None)
+async def get_precomputed_result(scene_id: str, request: Request):
     """
     Get pre-computed analysis results by scene ID.
 
@@ -127,34 +308,30 @@ async def get_precomputed_result(scene_id: str):
         scene_id: Scene identifier without .ply extension (e.g., "scene0000_00")
 
     Returns:
-        AnalysisResponse with pre-computed data
+        AnalysisResponse with pre-computed data, or 304 Not Modified when
+        If-None-Match matches the scene ETag
 
     Example:
         GET /api/v1/precomputed/scene0000_00
     """
     logger.info(f"Fetching pre-computed results for: {scene_id}")
+    return _serve_precomputed(scene_id, request, _render_precomputed, "application/json")
 
-    # Add .ply extension for lookup
-    filename = f"{scene_id}.ply"
-    scene = load_precomputed_results(filename)
+@app.get("/api/v2/precomputed/{scene_id}", response_model=None)
+async def get_precomputed_result_msgpack(scene_id: str, request: Request):
+    """
+    Get pre-computed analysis results by scene ID as MessagePack.
 
-    if scene is None:
-        logger.warning(f"No pre-computed results found for: {scene_id}")
-        available_scenes = list_available_scenes()
-        raise HTTPException(
-            status_code=404,
-            detail=f"No pre-computed results available for scene: {scene_id}. "
-                   f"Available scenes: {available_scenes}"
-        )
+    Same payload as /api/v1/precomputed/{scene_id}, encoded with MessagePack
+    and float32 numbers (smaller and cheaper to parse than the JSON).
 
-    return AnalysisResponse(
-        scene=scene,
-        inference_time=0.05,
-        model_version="SpatialLM1.1-Qwen-0.5B (pre-computed)",
-        point_count=50000
-    )
+    Example:
+        GET /api/v2/precomputed/scene0000_00
+    """
+    logger.info(f"Fetching pre-computed results (msgpack) for: {scene_id}")
+    return _serve_precomputed(scene_id, request, _render_precomputed_msgpack, "application/msgpack")
 
-@app.post("/api/v1/analyze")
+@app.post("/api/v1/analyze", response_model=None)
 async def analyze_scene(request: AnalysisRequest):
     """
     Analiza point cloud desde URL y retorna estructura 3D
@@ -166,123 +343,84 @@ async def analyze_scene(request: AnalysisRequest):
     # TODO: Implementar llamada real a HuggingFace API
     # Por ahora, retornamos datos de ejemplo (mock)
 
-    mock_scene = SceneStructure(
-        walls=[
-            Wall(
-                id="wall_0",
-                startPoint=Point3D(x=0.0, y=0.0, z=0.0),
-                endPoint=Point3D(x=5.0, y=0.0, z=0.0),
-                height=2.5
-            ),
-            Wall(
-                id="wall_1",
-                startPoint=Point3D(x=5.0, y=0.0, z=0.0),
-                endPoint=Point3D(x=5.0, y=4.0, z=0.0),
-                height=2.5
-            ),
-            Wall(
-                id="wall_2",
-                startPoint=Point3D(x=5.0, y=4.0, z=0.0),
-                endPoint=Point3D(x=0.0, y=4.0, z=0.0),
-                height=2.5
-            ),
-            Wall(
-                id="wall_3",
-                startPoint=Point3D(x=0.0, y=4.0, z=0.0),
-                endPoint=Point3D(x=0.0, y=0.0, z=0.0),
-                height=2.5
-            )
-        ],
-        doors=[
-            Door(
-                id="door_0",
-                wallId="wall_0",
-                position=Point3D(x=2.5, y=0.0, z=0.0),
-                width=0.9,
-                height=2.1
-            )
-        ],
-        windows=[
-            Window(
-                id="window_0",
-                wallId="wall_1",
-                position=Point3D(x=5.0, y=2.0, z=1.0),
-                width=1.2,
-                height=1.5
-            )
-        ],
-        objects=[
-            BoundingBox(
-                id="bbox_0",
-                objectClass="sofa",
-                position=Point3D(x=1.5, y=2.0, z=0.5),
-                rotation=0.0,
-                scale=Point3D(x=2.0, y=0.9, z=0.8),
-                confidence=0.95
-            ),
-            BoundingBox(
-                id="bbox_1",
-                objectClass="coffee_table",
-                position=Point3D(x=2.5, y=2.5, z=0.4),
-                rotation=0.0,
-                scale=Point3D(x=1.2, y=0.6, z=0.45),
-                confidence=0.89
-            )
-        ]
-    )
-
-    return AnalysisResponse(
-        scene=mock_scene,
-        inference_time=2.5,
-        model_version="SpatialLM1.1-Qwen-0.5B (mock)",
-        point_count=50000
-    )
+    return Response(content=MOCK_ANALYZE_BYTES, media_type="application/json")
 
-def load_precomputed_results(filename: str) -> Optional[SceneStructure]:
+@functools.lru_cache(maxsize=256)
+def _load_keyed(scene_id: str, mtime_ns: int) -> Optional[SceneStructure]:
     """
     Load pre-computed analysis results from JSON file.
 
-    Args:
-        filename: Name of the PLY file (e.g., "scene0000_00.ply")
-
-    Returns:
-        SceneStructure if pre-computed data exists, None otherwise
+    Memoized on the file's modification time, so the JSON file is only read
+    and validated again after it changes.
     """
-    # Extract scene ID from filename (e.g., "scene0000_00" from "scene0000_00.ply")
-    scene_id = filename.replace('.ply', '')
-    json_path = Path(__file__).parent / "mock_data" / f"{scene_id}_results.json"
-
-    logger.info(f"Looking for pre-computed results at: {json_path}")
+    json_path = _scene_index().get(scene_id)
 
-    if not json_path.exists():
-        logger.warning(f"No pre-computed results found for: {filename}")
+    if json_path is None:
         return None
 
+    logger.info(f"Loading pre-computed results from: {json_path}")
+
     try:
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-
-        # Convert JSON to SceneStructure
-        walls = [Wall(**w) for w in data.get('walls', [])]
-        doors = [Door(**d) for d in data.get('doors', [])]
-        windows = [Window(**w) for w in data.get('windows', [])]
-        objects = [BoundingBox(**obj) for obj in data.get('objects', [])]
-
-        logger.info(f"Loaded pre-computed results: {len(walls)} walls, {len(doors)} doors, {len(windows)} windows, {len(objects)} objects")
-
-        return SceneStructure(
-            walls=walls,
-            doors=doors,
-            windows=windows,
-            objects=objects
-        )
+        with open(json_path, 'rb') as f:
+            raw = f.read()
+
+        # Parse and validate straight from bytes (pydantic-core)
+        scene = SceneStructure.model_validate_json(raw)
+
+        logger.info(f"Loaded pre-computed results: {len(scene.walls)} walls, {len(scene.doors)} doors, {len(scene.windows)} windows, {len(scene.objects)} objects")
+
+        return scene
 
     except Exception as e:
         logger.error(f"Error loading pre-computed results: {e}")
         return None
 
+@functools.lru_cache(maxsize=256)
+def _render_precomputed(scene_id: str, mtime_ns: int) -> Optional[Tuple[bytes, str]]:
+    """Serialize the full AnalysisResponse of a pre-computed scene, with its ETag."""
+    response = _precomputed_response(scene_id, mtime_ns)
+    if response is None:
+        return None
+    blob = response.model_dump_json().encode()
+    return blob, _etag(blob)
+
+@functools.lru_cache(maxsize=256)
+def _render_precomputed_msgpack(scene_id: str, mtime_ns: int) -> Optional[Tuple[bytes, str]]:
+    """Same as _render_precomputed, encoded as MessagePack with float32 numbers."""
+    response = _precomputed_response(scene_id, mtime_ns)
+    if response is None:
+        return None
+    blob = msgpack.packb(response.model_dump(), use_bin_type=True, use_single_float=True)
+    return blob, _etag(blob)
+
+def _precomputed_response(scene_id: str, mtime_ns: int) -> Optional[AnalysisResponse]:
+    """Wrap a pre-computed scene in an AnalysisResponse, None if it cannot be loaded."""
+    scene = _load_keyed(scene_id, mtime_ns)
+    if scene is None:
+        return None
+    return AnalysisResponse(
+        scene=scene,
+        inference_time=0.05,
+        model_version="SpatialLM1.1-Qwen-0.5B (pre-computed)",
+        point_count=50000
+    )
 
-@app.post("/api/v1/analyze/file")
+def _etag(blob: bytes) -> str:
+    """Weak ETag of a blob (GZipMiddleware may send the same content gzip-encoded)."""
+    return f'W/"{hashlib.blake2b(blob).hexdigest()[:16]}"'
+
+def _warm_precomputed_cache() -> None:
+    """Load and serialize every pre-computed scene at startup."""
+    rendered = 0
+    for scene_id in list_available_scenes():
+        mtime_ns = _scene_mtime_ns(scene_id)
+        if mtime_ns is not None and _render_precomputed(scene_id, mtime_ns) is not None:
+            _render_precomputed_msgpack(scene_id, mtime_ns)
+            rendered += 1
+    logger.info(f"Serialized {rendered} pre-computed scenes")
+
+
+@app.post("/api/v1/analyze/file", response_model=None)
 async def analyze_scene_file(file: UploadFile = File(...)):
     """
     Analiza point cloud desde archivo .ply subido.
@@ -292,62 +430,36 @@ async def analyze_scene_file(file: UploadFile = File(...)):
     """
     logger.info(f"Received file: {file.filename}")
 
-    # Validar extension
-    if not file.filename.endswith('.ply'):
+    # Validar nombre y extension antes de leer el contenido
+    if not file.filename or not file.filename.endswith('.ply'):
         raise HTTPException(status_code=400, detail="Solo se aceptan archivos .ply")
 
-    # Guardar archivo temporalmente
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".ply") as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-
-        logger.info(f"File saved temporarily at: {tmp_path}")
-
-        # Load pre-computed results if available
-        scene = load_precomputed_results(file.filename)
-
-        if scene is None:
-            # Fallback to default mock data
-            logger.info("Using fallback mock data")
-            scene = SceneStructure(
-                walls=[
-                    Wall(
-                        id="wall_0",
-                        startPoint=Point3D(x=0.0, y=0.0, z=0.0),
-                        endPoint=Point3D(x=5.0, y=0.0, z=0.0),
-                        height=2.5
-                    )
-                ],
-                doors=[],
-                windows=[],
-                objects=[
-                    BoundingBox(
-                        id="bbox_0",
-                        objectClass="unknown",
-                        position=Point3D(x=2.5, y=2.0, z=0.5),
-                        rotation=0.0,
-                        scale=Point3D(x=1.0, y=1.0, z=1.0),
-                        confidence=0.5
-                    )
-                ]
-            )
-
-        # Limpiar archivo temporal
-        os.unlink(tmp_path)
-
-        return AnalysisResponse(
-            scene=scene,
-            inference_time=0.05,  # Instant with pre-computed data
-            model_version="SpatialLM1.1-Qwen-0.5B (pre-computed)",
-            point_count=50000
-        )
+    # El contenido no se usa: los resultados se buscan por nombre de archivo
+    await file.close()
 
-    except Exception as e:
-        logger.error(f"Error processing file: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    # Extract scene ID from filename (e.g., "scene0000_00" from "scene0000_00.ply")
+    scene_id = file.filename.replace('.ply', '')
+    mtime_ns = _scene_mtime_ns(scene_id)
+    precomputed = _render_precomputed(scene_id, mtime_ns) if mtime_ns is not None else None
+
+    if precomputed is None:
+        # Fallback to default mock data
+        logger.info(f"No pre-computed results for {file.filename}, using fallback mock data")
+        return Response(content=MOCK_FALLBACK_BYTES, media_type="application/json")
+
+    # Same bytes as GET /api/v1/precomputed/{scene_id}
+    return Response(content=precomputed[0], media_type="application/json")
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # uvloop no soporta Windows; ahi se usa el event loop estandar
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", 2))
+    )
@@ -4,13 +4,18 @@ Ejecutar: python test_api.py
 """
 import requests
 import json
+import msgpack
 
 BASE_URL = "http://localhost:8000"
+SCENE_ID = "scene0000_00"
+
+# Sesion compartida: reutiliza la conexion HTTP entre tests
+SESSION = requests.Session()
 
 def test_root():
     """Test endpoint root"""
     print("\n1. Testing GET /")
-    response = requests.get(f"{BASE_URL}/")
+    response = SESSION.get(f"{BASE_URL}/")
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2)}")
     assert response.status_code == 200
@@ -18,7 +23,7 @@ def test_root():
 def test_health():
     """Test health check"""
     print("\n2. Testing GET /health")
-    response = requests.get(f"{BASE_URL}/health")
+    response = SESSION.get(f"{BASE_URL}/health")
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2)}")
     assert response.status_code == 200
@@ -33,7 +38,7 @@ def test_analyze():
         "detect_objects": True,
         "object_categories": ["furniture", "appliances"]
     }
-    response = requests.post(
+    response = SESSION.post(
         f"{BASE_URL}/api/v1/analyze",
         json=payload
     )
@@ -47,6 +52,44 @@ def test_analyze():
     print(f"Model: {result['model_version']}")
     assert response.status_code == 200
 
+def test_precomputed():
+    """Test pre-computed results endpoint (JSON + ETag)"""
+    print(f"\n4. Testing GET /api/v1/precomputed/{SCENE_ID}")
+    response = SESSION.get(f"{BASE_URL}/api/v1/precomputed/{SCENE_ID}")
+    print(f"Status: {response.status_code}")
+    print(f"Content-Type: {response.headers.get('Content-Type')}")
+    print(f"ETag: {response.headers.get('ETag')}")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("application/json")
+    assert set(response.json()) == {"scene", "inference_time", "model_version", "point_count"}
+
+    response = SESSION.get(
+        f"{BASE_URL}/api/v1/precomputed/{SCENE_ID}",
+        headers={"If-None-Match": response.headers["ETag"]}
+    )
+    print(f"Revalidation status: {response.status_code}")
+    assert response.status_code == 304
+
+def test_precomputed_msgpack():
+    """Test pre-computed results endpoint (MessagePack + ETag)"""
+    print(f"\n5. Testing GET /api/v2/precomputed/{SCENE_ID}")
+    response = SESSION.get(f"{BASE_URL}/api/v2/precomputed/{SCENE_ID}")
+    print(f"Status: {response.status_code}")
+    print(f"Content-Type: {response.headers.get('Content-Type')}")
+    print(f"Size: {len(response.content)} bytes")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("application/msgpack")
+    result = msgpack.unpackb(response.content)
+    assert set(result) == {"scene", "inference_time", "model_version", "point_count"}
+    assert set(result["scene"]) == {"walls", "doors", "windows", "objects"}
+
+    response = SESSION.get(
+        f"{BASE_URL}/api/v2/precomputed/{SCENE_ID}",
+        headers={"If-None-Match": response.headers["ETag"]}
+    )
+    print(f"Revalidation status: {response.status_code}")
+    assert response.status_code == 304
+
 if __name__ == "__main__":
     print("=" * 60)
     print("Testing SpatialLM3D Backend API")
@@ -56,6 +99,8 @@ if __name__ == "__main__":
         test_root()
         test_health()
         test_analyze()
+        test_precomputed()
+        test_precomputed_msgpack()
 
         print("\n" + "=" * 60)
         print("All tests passed!")
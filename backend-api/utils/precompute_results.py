@@ -21,22 +21,22 @@ Output format (JSON):
     }
 """
 
-import re
-import json
+import math
+import orjson
 import argparse
 from pathlib import Path
-from typing import Dict, List, Any
-from dataclasses import dataclass, asdict
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Tuple, Union
+from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Point3D:
     x: float
     y: float
     z: float
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Wall:
     id: str
     start_x: float
@@ -47,8 +47,20 @@ class Wall:
     end_z: float
     height: float
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "start_x": self.start_x,
+            "start_y": self.start_y,
+            "start_z": self.start_z,
+            "end_x": self.end_x,
+            "end_y": self.end_y,
+            "end_z": self.end_z,
+            "height": self.height
+        }
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class Door:
     id: str
     wall_id: str
@@ -58,8 +70,19 @@ class Door:
     width: float
     height: float
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "wall_id": self.wall_id,
+            "position_x": self.position_x,
+            "position_y": self.position_y,
+            "position_z": self.position_z,
+            "width": self.width,
+            "height": self.height
+        }
+
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Window:
     id: str
     wall_id: str
@@ -69,8 +92,19 @@ class Window:
     width: float
     height: float
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "wall_id": self.wall_id,
+            "position_x": self.position_x,
+            "position_y": self.position_y,
+            "position_z": self.position_z,
+            "width": self.width,
+            "height": self.height
+        }
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class BoundingBox:
     id: str
     object_class: str
@@ -83,113 +117,135 @@ class BoundingBox:
     scale_z: float
     confidence: float = 0.95
 
-
-def parse_bbox_line(line: str, bbox_id: str) -> BoundingBox:
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "object_class": self.object_class,
+            "position_x": self.position_x,
+            "position_y": self.position_y,
+            "position_z": self.position_z,
+            "rotation_z": self.rotation_z,
+            "scale_x": self.scale_x,
+            "scale_y": self.scale_y,
+            "scale_z": self.scale_z,
+            "confidence": self.confidence
+        }
+
+
+# var_name prefix -> (output key, kind name)
+ENTITY_KINDS = {
+    'wall_': ('walls', 'Wall'),
+    'door_': ('doors', 'Door'),
+    'window_': ('windows', 'Window'),
+    'bbox_': ('objects', 'Bbox'),
+}
+
+# Top-level keys of the output JSON, in the order they are written
+OUTPUT_KEYS = tuple(kind[0] for kind in ENTITY_KINDS.values())
+
+
+def _parse_float(value: str) -> float:
+    """float() that rejects nan/inf, which would be written as JSON null."""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"Non-finite value: {value}")
+    return number
+
+
+def parse_line(
+    var_name: str, line: str, expected_kind: str
+) -> Union[Wall, Door, Window, BoundingBox]:
     """
-    Parse a bbox line from SpatialLM output.
+    Parse one line of SpatialLM output into its dataclass.
 
-    Format: bbox_0=Bbox(sofa, 3.2, 5.7, 0.4, 1.57, 2.3, 0.9, 0.8)
-    Args: (label, center_x, center_y, center_z, rotation_z, scale_x, scale_y, scale_z)
-    """
-    pattern = r'Bbox\(([^,]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+)\)'
-    match = re.search(pattern, line)
-
-    if not match:
-        raise ValueError(f"Could not parse bbox line: {line}")
-
-    label = match.group(1).strip()
-    values = [float(match.group(i)) for i in range(2, 9)]
-
-    return BoundingBox(
-        id=bbox_id,
-        object_class=label,
-        position_x=values[0],
-        position_y=values[1],
-        position_z=values[2],
-        rotation_z=values[3],
-        scale_x=values[4],
-        scale_y=values[5],
-        scale_z=values[6],
-        confidence=0.95  # Default confidence
-    )
+    The kind in the line (e.g. "Wall") must match expected_kind, the kind
+    implied by the variable prefix (see ENTITY_KINDS).
 
+    Format: <var_name>=<Kind>(field, field, ...)
+        bbox_0=Bbox(label, center_x, center_y, center_z, rotation_z, scale_x, scale_y, scale_z)
+        wall_0=Wall(start_x, start_y, start_z, end_x, end_y, end_z, height)
+        door_0=Door(wall_id, pos_x, pos_y, pos_z, width, height)
+        window_0=Window(wall_id, pos_x, pos_y, pos_z, width, height)
 
-def parse_wall_line(line: str, wall_id: str) -> Wall:
+    Anything after the closing parenthesis (e.g. a trailing comment) is ignored.
     """
-    Parse a wall line from SpatialLM output.
-
-    Format: wall_0=Wall(start_x, start_y, start_z, end_x, end_y, end_z, height)
-    """
-    pattern = r'Wall\(([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+)\)'
-    match = re.search(pattern, line)
-
-    if not match:
-        raise ValueError(f"Could not parse wall line: {line}")
-
-    values = [float(match.group(i)) for i in range(1, 8)]
-
-    return Wall(
-        id=wall_id,
-        start_x=values[0],
-        start_y=values[1],
-        start_z=values[2],
-        end_x=values[3],
-        end_y=values[4],
-        end_z=values[5],
-        height=values[6]
-    )
-
-
-def parse_door_line(line: str, door_id: str) -> Door:
-    """
-    Parse a door line from SpatialLM output.
-
-    Format: door_0=Door(wall_id, pos_x, pos_y, pos_z, width, height)
+    try:
+        kind, body = line.split('=', 1)[1].split('(', 1)
+    except ValueError:
+        raise ValueError(f"Could not parse line: {line}") from None
+
+    kind = kind.strip()
+    fields = [f.strip() for f in body.rsplit(')', 1)[0].split(',')]
+
+    if kind != expected_kind:
+        raise ValueError(f"Expected {expected_kind} for {var_name}, got {kind}: {line}")
+
+    try:
+        if kind == 'Bbox' and len(fields) == 8:
+            return BoundingBox(
+                id=var_name,
+                object_class=fields[0],
+                position_x=_parse_float(fields[1]),
+                position_y=_parse_float(fields[2]),
+                position_z=_parse_float(fields[3]),
+                rotation_z=_parse_float(fields[4]),
+                scale_x=_parse_float(fields[5]),
+                scale_y=_parse_float(fields[6]),
+                scale_z=_parse_float(fields[7]),
+                confidence=0.95  # Default confidence
+            )
+
+        if kind == 'Wall' and len(fields) == 7:
+            return Wall(
+                id=var_name,
+                start_x=_parse_float(fields[0]),
+                start_y=_parse_float(fields[1]),
+                start_z=_parse_float(fields[2]),
+                end_x=_parse_float(fields[3]),
+                end_y=_parse_float(fields[4]),
+                end_z=_parse_float(fields[5]),
+                height=_parse_float(fields[6])
+            )
+
+        if kind in ('Door', 'Window') and len(fields) == 6:
+            opening_cls = Door if kind == 'Door' else Window
+            return opening_cls(
+                id=var_name,
+                wall_id=fields[0],
+                position_x=_parse_float(fields[1]),
+                position_y=_parse_float(fields[2]),
+                position_z=_parse_float(fields[3]),
+                width=_parse_float(fields[4]),
+                height=_parse_float(fields[5])
+            )
+    except ValueError:
+        pass
+
+    raise ValueError(f"Could not parse {kind} line: {line}")
+
+
+def parse_stream(input_file: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
     """
-    pattern = r'Door\(([^,]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+)\)'
-    match = re.search(pattern, line)
-
-    if not match:
-        raise ValueError(f"Could not parse door line: {line}")
-
-    wall_id = match.group(1).strip()
-    values = [float(match.group(i)) for i in range(2, 7)]
-
-    return Door(
-        id=door_id,
-        wall_id=wall_id,
-        position_x=values[0],
-        position_y=values[1],
-        position_z=values[2],
-        width=values[3],
-        height=values[4]
-    )
+    Parse SpatialLM text output into (output key, record) pairs.
 
+    The file is read once per entity kind, so records come out grouped in
+    OUTPUT_KEYS order while only one line is held in memory at a time.
+    Callers can write them out without building the whole scene.
 
-def parse_window_line(line: str, window_id: str) -> Window:
+    Args:
+        input_file: Path to the .txt file with SpatialLM output
     """
-    Parse a window line from SpatialLM output.
+    for prefix, (key, kind) in ENTITY_KINDS.items():
+        with open(input_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line or '=' not in line:
+                    continue
 
-    Format: window_0=Window(wall_id, pos_x, pos_y, pos_z, width, height)
-    """
-    pattern = r'Window\(([^,]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+),\s*([\d.-]+)\)'
-    match = re.search(pattern, line)
-
-    if not match:
-        raise ValueError(f"Could not parse window line: {line}")
-
-    wall_id = match.group(1).strip()
-    values = [float(match.group(i)) for i in range(2, 7)]
-
-    return Window(
-        id=window_id,
-        wall_id=wall_id,
-        position_x=values[0],
-        position_y=values[1],
-        position_z=values[2],
-        width=values[3],
-        height=values[4]
-    )
+                # Extract ID and keep only lines of this kind
+                var_name = line.split('=', 1)[0].strip()
+                if var_name.startswith(prefix):
+                    yield key, parse_line(var_name, line, kind).to_dict()
 
 
 def convert_to_json(input_file: Path) -> Dict[str, Any]:
@@ -202,45 +258,58 @@ def convert_to_json(input_file: Path) -> Dict[str, Any]:
     Returns:
         Dictionary with walls, doors, windows, and objects
     """
-    walls = []
-    doors = []
-    windows = []
-    objects = []
-
-    with open(input_file, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-
-            # Extract ID and type
-            if '=' in line:
-                var_name, _ = line.split('=', 1)
-                var_name = var_name.strip()
-
-                # Determine type and parse
-                if var_name.startswith('bbox_'):
-                    obj = parse_bbox_line(line, var_name)
-                    objects.append(asdict(obj))
-
-                elif var_name.startswith('wall_'):
-                    wall = parse_wall_line(line, var_name)
-                    walls.append(asdict(wall))
-
-                elif var_name.startswith('door_'):
-                    door = parse_door_line(line, var_name)
-                    doors.append(asdict(door))
-
-                elif var_name.startswith('window_'):
-                    window = parse_window_line(line, var_name)
-                    windows.append(asdict(window))
-
-    return {
-        "walls": walls,
-        "doors": doors,
-        "windows": windows,
-        "objects": objects
-    }
+    result = {key: [] for key in OUTPUT_KEYS}
+    for key, record in parse_stream(input_file):
+        result[key].append(record)
+    return result
+
+
+def write_json_stream(records: Iterable[Tuple[str, Dict[str, Any]]], f: BinaryIO, pretty: bool = False) -> Dict[str, int]:
+    """
+    Write records from parse_stream to a binary file as one JSON object.
+
+    Each record is serialized as soon as it is produced, and each array is
+    closed as soon as the next key starts. Records must be grouped in
+    OUTPUT_KEYS order; an unknown or out-of-order key raises ValueError.
+    The output is byte-identical to orjson.dumps(convert_to_json(...)) with
+    the same indent option.
+
+    Returns:
+        Number of records written per output key
+    """
+    option = orjson.OPT_INDENT_2 if pretty else 0
+    newline, indent, colon = (b"\n", b"  ", b": ") if pretty else (b"", b"", b":")
+    counts = dict.fromkeys(OUTPUT_KEYS, 0)
+    current = -1  # Index in OUTPUT_KEYS of the array being written
+
+    def advance_to(index: int) -> None:
+        # Close the open array and open (empty) arrays up to index
+        nonlocal current
+        while current < index:
+            if current >= 0:
+                f.write((newline + indent if counts[OUTPUT_KEYS[current]] else b"") + b"]")
+            current += 1
+            if current < len(OUTPUT_KEYS):
+                f.write((b"," if current else b"") + newline + indent + orjson.dumps(OUTPUT_KEYS[current]) + colon + b"[")
+
+    f.write(b"{")
+    for key, record in records:
+        if key not in counts:
+            raise ValueError(f"Unknown output key: {key}")
+        index = OUTPUT_KEYS.index(key)
+        if index < current:
+            raise ValueError(f"Record for '{key}' after '{OUTPUT_KEYS[current]}': records must follow OUTPUT_KEYS order")
+        advance_to(index)
+
+        item = orjson.dumps(record, option=option)
+        if pretty:
+            item = item.replace(b"\n", b"\n" + indent * 2)
+        f.write((b"," if counts[key] else b"") + newline + indent * 2 + item)
+        counts[key] += 1
+    advance_to(len(OUTPUT_KEYS))
+    f.write(newline + b"}")
+
+    return counts
 
 
 def main():
@@ -277,21 +346,23 @@ def main():
     # Create output directory if needed
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # Convert and save
+    # Convert and save incrementally (via a temp file, so a parse error
+    # does not leave a truncated JSON behind)
     print(f"Processing: {input_path}")
-    result = convert_to_json(input_path)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            counts = write_json_stream(parse_stream(input_path), f, pretty=args.pretty)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    tmp_path.replace(output_path)
 
     print(f"Found:")
-    print(f"  - {len(result['walls'])} walls")
-    print(f"  - {len(result['doors'])} doors")
-    print(f"  - {len(result['windows'])} windows")
-    print(f"  - {len(result['objects'])} objects")
-
-    with open(output_path, 'w') as f:
-        if args.pretty:
-            json.dump(result, f, indent=2)
-        else:
-            json.dump(result, f)
+    print(f"  - {counts['walls']} walls")
+    print(f"  - {counts['doors']} doors")
+    print(f"  - {counts['windows']} windows")
+    print(f"  - {counts['objects']} objects")
 
     print(f"Saved to: {output_path}")
     return 0